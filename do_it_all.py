@@ -1,6 +1,9 @@
 
 import os
+import sys
+import hashlib
 import subprocess
+import openpyxl
 import pandas as pd
 import argparse
 import time
@@ -11,90 +14,239 @@ BROWSER_EXTRACTOR_SCRIPT = 'gemini_extractor.py'
 API_VALIDATION_SCRIPT = 'gemini_api_validation_agent.py'
 BROWSER_VALIDATION_SCRIPT = 'validation_agent.py'
 DISCREPANCY_FILE = 'validation_discrepancies.xlsx'
+DISCREPANCY_STATE = 'validation_discrepancies.parquet'
+DISCREPANCY_JSONL = 'validation_discrepancies.jsonl'
 OUTPUT_FILE = 'extracted_studies.xlsx'
+OUTPUT_STATE = 'extracted_studies.parquet'
 ARTICLES_DIR = 'Articles'
 HEALING_REPORT = 'healing_comparison_report.xlsx'
+CACHE_DIR = '.cache'
+
+def read_workbook(path):
+    """Reads an xlsx sheet into a DataFrame.
+
+    Prefers the Rust-based calamine engine (pandas >= 2.2, needs
+    python-calamine); falls back to openpyxl read-only streaming.
+    """
+    try:
+        return pd.read_excel(path, engine='calamine')
+    except (ImportError, ValueError):
+        pass
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.values
+        header = next(rows, None)
+        return pd.DataFrame(rows, columns=header)
+    finally:
+        wb.close()
+
+def cached_read_excel(path):
+    """Reads an xlsx through a content-hash Parquet cache so repeat parses are skipped."""
+    with open(path, 'rb') as f:
+        h = hashlib.blake2b(f.read()).hexdigest()[:32]
+    cache_path = os.path.join(CACHE_DIR, h + '.parquet')
+    if os.path.exists(cache_path):
+        try:
+            return pd.read_parquet(cache_path)
+        except Exception:
+            pass
+    df = read_workbook(path)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_parquet(cache_path)
+    except Exception:
+        pass
+    return df
+
+def write_workbook(df, path):
+    """Writes a DataFrame to xlsx, streaming rows in constant memory.
+
+    Prefers xlsxwriter's constant_memory mode (rows go straight to disk);
+    falls back to openpyxl write-only streaming.
+    """
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+
+    if xlsxwriter is not None:
+        wb = xlsxwriter.Workbook(path, {'constant_memory': True})
+        ws = wb.add_worksheet()
+        ws.write_row(0, 0, [str(c) for c in df.columns])
+        for i, row in enumerate(df.itertuples(index=False, name=None), start=1):
+            ws.write_row(i, 0, [None if pd.isna(v) else v for v in row])
+        wb.close()
+        return
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        ws.append([None if pd.isna(v) else v for v in row])
+    wb.save(path)
+
+class WorkbookCache:
+    """Caches pipeline state as a DataFrame, only re-reading when the file changes on disk.
+
+    Reads prefer the Parquet state sidecar (fast, columnar) over the xlsx,
+    which is kept purely for human consumption.
+    """
+    def __init__(self, path, state_path):
+        self.path = path
+        self.state_path = state_path
+        self.df = None
+        self.mtime = None
+        self.source = None
+
+    def _source(self):
+        return self.state_path if os.path.exists(self.state_path) else self.path
+
+    def load(self):
+        """Returns the cached DataFrame, re-reading the file only if its mtime changed."""
+        source = self._source()
+        if not os.path.exists(source):
+            self.df = None
+            self.mtime = None
+            self.source = None
+            return None
+        mtime = os.path.getmtime(source)
+        if self.df is None or mtime != self.mtime or source != self.source:
+            if source.endswith('.parquet'):
+                self.df = pd.read_parquet(source)
+            else:
+                self.df = cached_read_excel(source)
+            self.mtime = mtime
+            self.source = source
+        return self.df
+
+    def save(self):
+        """Writes the cached DataFrame back to the Parquet state and the xlsx render."""
+        if self.df is not None:
+            try:
+                self.df.to_parquet(self.state_path, engine='pyarrow', compression='zstd')
+            except Exception as e:
+                print(f"Warning: Parquet state write failed ({e}).")
+            write_workbook(self.df, self.path)
+            self.source = self._source()
+            self.mtime = os.path.getmtime(self.source)
 
 def run_script(script_name, args=[]):
-    """Runs a python script as a subprocess."""
+    """Runs a python script as a subprocess, streaming its output line by line."""
     print(f"\n>>> Running {script_name} with args: {args}...")
     cmd = ['python', script_name] + args
     try:
-        # We use subprocess.run so we can see the output in real-time if possible
-        # or at least wait for it to finish.
-        subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
+        # Line-buffered pipe so child progress (tqdm etc.) reaches us immediately
+        # and the orchestrator can react to output as it appears. With stdout
+        # piped the children lose the Windows UTF-16 console path, so force
+        # UTF-8 on both ends or their emoji output dies with UnicodeEncodeError
+        # under the locale codepage.
+        child_env = dict(os.environ, PYTHONIOENCODING='utf-8')
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              bufsize=1, text=True, encoding='utf-8', errors='replace',
+                              env=child_env) as proc:
+            for line in proc.stdout:
+                sys.stdout.write(line)
+                sys.stdout.flush()
+    except OSError as e:
         print(f"Error running {script_name}: {e}")
         return False
+    if proc.returncode != 0:
+        print(f"Error running {script_name}: exit code {proc.returncode}")
+        return False
     return True
 
 def get_failed_files():
     """Reads the discrepancy log and returns a list of files that failed validation."""
-    if not os.path.exists(DISCREPANCY_FILE):
-        return []
-    
-    df = pd.read_excel(DISCREPANCY_FILE)
-    if 'Source File' not in df.columns or 'Status' not in df.columns:
+    # A missing log is the common case; let open() report it instead of stat-ing first
+    try:
+        df = pd.read_parquet(DISCREPANCY_STATE)
+        if 'Source File' not in df.columns or 'Status' not in df.columns:
+            return []
+        # Get unique filenames where Status is FAIL
+        failed_files = df[df['Status'] == 'FAIL']['Source File'].unique().tolist()
+        return [str(f) for f in failed_files if pd.notnull(f)]
+    except FileNotFoundError:
+        pass
+
+    # Only two columns are needed, so stream rows directly instead of building a DataFrame
+    try:
+        wb = openpyxl.load_workbook(DISCREPANCY_FILE, read_only=True, data_only=True)
+    except FileNotFoundError:
         return []
-    
-    # Get unique filenames where Status is FAIL
-    failed_files = df[df['Status'] == 'FAIL']['Source File'].unique().tolist()
-    return [str(f) for f in failed_files if pd.notnull(f)]
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header or 'Source File' not in header or 'Status' not in header:
+            return []
+        si = header.index('Source File')
+        ti = header.index('Status')
+        failed_files = []
+        seen = set()
+        for r in rows:
+            if len(r) > max(si, ti) and r[ti] == 'FAIL' and r[si] is not None and r[si] not in seen:
+                seen.add(r[si])
+                failed_files.append(str(r[si]))
+        return failed_files
+    finally:
+        wb.close()
 
-def cleanup_failed_entries(failed_files):
-    """Removes the failed entries from the main output file and returns them for comparison."""
-    if not os.path.exists(OUTPUT_FILE) or not failed_files:
+def cleanup_failed_entries(cache, failed_files):
+    """Removes the failed entries from the cached output and returns them for comparison."""
+    df = cache.load()
+    if df is None or not failed_files:
         return None
-    
-    df = pd.read_excel(OUTPUT_FILE)
+
+    failed_set = set(failed_files)
     # Capture the "Before" state
-    failed_rows = df[df['Source File'].isin(failed_files)].copy()
-    
-    # Remove rows where Source File is in failed_files
+    failed_rows = df[df['Source File'].isin(failed_set)].copy()
+
+    # Remove rows where Source File is in failed_files (in memory, single write at the end)
     initial_len = len(df)
-    df = df[~df['Source File'].isin(failed_files)]
-    
-    if len(df) < initial_len:
-        print(f"Cleaned up {initial_len - len(df)} failed entries from {OUTPUT_FILE} to prepare for re-extraction.")
-        df.to_excel(OUTPUT_FILE, index=False)
-    
+    cache.df = df[~df['Source File'].isin(failed_set)]
+
+    if len(cache.df) < initial_len:
+        print(f"Cleaned up {initial_len - len(cache.df)} failed entries from {cache.path} to prepare for re-extraction.")
+        cache.save()
+
+    # Drop the content hashes too, or the extractor's hash skip would treat
+    # the removed files as already extracted on every later run
+    import gemini_extractor
+    gemini_extractor.discard_extracted_hashes(failed_set)
+
     return failed_rows
 
-def generate_healing_report(before_df, current_output_file, failed_files):
+def generate_healing_report(before_df, after_df, failed_files):
     """Compares the old failed data with the new re-extracted data and saves a report."""
-    if before_df is None or before_df.empty or not os.path.exists(current_output_file):
+    if before_df is None or before_df.empty or after_df is None:
         return
 
-    after_df = pd.read_excel(current_output_file)
-    after_df = after_df[after_df['Source File'].isin(failed_files)]
-    
-    comparison_data = []
-    
     # Ensure both have Source File as index for easier lookup
     before_df = before_df.set_index('Source File')
-    after_df = after_df.set_index('Source File')
-    
-    for filename in failed_files:
-        if filename in before_df.index and filename in after_df.index:
-            old_row = before_df.loc[[filename]].iloc[0]
-            new_row = after_df.loc[[filename]].iloc[0]
-            
-            # Compare all columns common to both
-            common_cols = [c for c in before_df.columns if c in after_df.columns and c not in ['Result', 'Sl.no']]
-            
-            for col in common_cols:
-                old_val = str(old_row[col]) if pd.notnull(old_row[col]) else "NULL"
-                new_val = str(new_row[col]) if pd.notnull(new_row[col]) else "NULL"
-                
-                if old_val != new_val:
-                    comparison_data.append({
-                        'Article': filename,
-                        'Field': col,
-                        'Original Value': old_val,
-                        'Healed Value': new_val,
-                        'Status': 'FIXED'
-                    })
-    
+    after_df = after_df[after_df['Source File'].isin(failed_files)].set_index('Source File')
+
+    # Keep the first row per file, matching the old .loc[[f]].iloc[0] behaviour
+    before_df = before_df[~before_df.index.duplicated()]
+    after_df = after_df[~after_df.index.duplicated()]
+
+    common_files = [f for f in failed_files if f in before_df.index and f in after_df.index]
+    common_cols = [c for c in before_df.columns if c in after_df.columns and c not in ('Result', 'Sl.no')]
+
+    comparison_data = []
+    if common_files and common_cols:
+        # One C-level comparison over the aligned blocks instead of per-cell Python checks
+        b = before_df.loc[common_files, common_cols].fillna('NULL').astype(str)
+        a = after_df.loc[common_files, common_cols].fillna('NULL').astype(str)
+        changed = b.ne(a).stack()
+        for filename, col in changed[changed].index:
+            comparison_data.append({
+                'Article': filename,
+                'Field': col,
+                'Original Value': b.at[filename, col],
+                'Healed Value': a.at[filename, col],
+                'Status': 'FIXED'
+            })
+
+
     if comparison_data:
         report_df = pd.DataFrame(comparison_data)
         report_df.to_excel(HEALING_REPORT, index=False)
@@ -122,12 +274,12 @@ def main():
         validation_script = BROWSER_VALIDATION_SCRIPT
         api_args = ['--browser', args.browser]
 
-    # Clear previous logs to ensure we only heal NEW failures
-    if os.path.exists(DISCREPANCY_FILE):
+    # Clear previous logs to ensure we only heal NEW failures (single syscall, no stat first)
+    for old_log in (DISCREPANCY_FILE, DISCREPANCY_STATE, DISCREPANCY_JSONL):
         try:
-            os.remove(DISCREPANCY_FILE)
-            print(f"Cleared old log: {DISCREPANCY_FILE}")
-        except:
+            os.remove(old_log)
+            print(f"Cleared old log: {old_log}")
+        except OSError:
             pass
     
     # PHASE 1: Initial Validation
@@ -153,17 +305,29 @@ def main():
     print(f"Found {len(failed_files)} files with discrepancies: {failed_files}")
     
     # Prepare for re-extraction by removing old failed data and capturing a snapshot
-    before_healing_snapshot = cleanup_failed_entries(failed_files)
+    output_cache = WorkbookCache(OUTPUT_FILE, OUTPUT_STATE)
+    before_healing_snapshot = cleanup_failed_entries(output_cache, failed_files)
     
     print(f"Re-triggering extraction for {len(failed_files)} files...")
-    run_script(extractor_script, api_args + ['--files'] + failed_files)
+    if args.key:
+        run_script(extractor_script, api_args + ['--files'] + failed_files)
+    else:
+        # Reuse one in-process browser session instead of relaunching via subprocess
+        import gemini_extractor
+        pdf_paths = [os.path.join(ARTICLES_DIR, f) for f in failed_files
+                     if os.path.exists(os.path.join(ARTICLES_DIR, f))]
+        try:
+            with gemini_extractor.Extractor(args.browser) as extractor:
+                extractor.extract_files(pdf_paths)
+        except RuntimeError as e:
+            print(f"Browser re-extraction failed: {e}")
     
     # PHASE 3: Final Validation Check
     print("\n=== PHASE 3: FINAL VALIDATION OF HEALED DATA ===")
     run_script(validation_script, api_args + ['--files'] + failed_files)
     
-    # Generate Comparison Report
-    generate_healing_report(before_healing_snapshot, OUTPUT_FILE, failed_files)
+    # Generate Comparison Report (cache re-reads only because re-extraction changed the file)
+    generate_healing_report(before_healing_snapshot, output_cache.load(), failed_files)
     
     print("\nMaster Orchestration Complete.")
     
@@ -10,6 +10,7 @@ from datetime import datetime
 # Configuration
 ARTICLES_DIR = 'Articles'
 OUTPUT_FILE = 'extracted_studies.xlsx'
+STATE_FILE = 'extracted_studies.parquet'
 MODEL_NAME = "models/gemini-2.0-flash"
 
 # Column Definitions (Matches the paper and the original Playwright version)
@@ -62,23 +63,34 @@ OUTCOMES = [
 
 ALL_COLUMNS = [c[0] for c in STUDY_CHARACTERISTICS] + [c[0] for c in OUTCOMES if c[0] != "Study ID"]
 
-def create_prompt():
-    prompt = "You are an expert scientific data extractor. Extract the following information from the attached PDF study.\n"
-    prompt += "Return the result as a valid JSON object where keys are the 'Column Label' and values are the extracted text/numbers. If information is strictly missing, use null.\n"
-    prompt += "Do not hallucinate data. If you are unsure, extraction is better left as null.\n\n"
-    
-    prompt += "--- Study Characteristics ---\n"
-    for label, desc in STUDY_CHARACTERISTICS:
-        prompt += f"- {label}: {desc}\n"
-    
-    prompt += "\n--- Outcomes ---\n"
-    for label, desc in OUTCOMES:
-        if label == "Study ID": continue 
-        prompt += f"- {label}: {desc}\n"
-    
-    prompt += "\nRule: Convert as many possible percentage numbers into whole numbers (as ratios/mean ± std etc.) where denominators are available.\n"
-    prompt += "\nReturn ONLY the JSON object. No markdown formatting, no preamble."
-    return prompt
+# The prompt is deterministic, so build it once at import time
+PROMPT_TEXT = (
+    "You are an expert scientific data extractor. Extract the following information from the attached PDF study.\n"
+    "Return the result as a valid JSON object where keys are the 'Column Label' and values are the extracted text/numbers. If information is strictly missing, use null.\n"
+    "Do not hallucinate data. If you are unsure, extraction is better left as null.\n\n"
+    "--- Study Characteristics ---\n"
+    + "\n".join(f"- {label}: {desc}" for label, desc in STUDY_CHARACTERISTICS)
+    + "\n\n--- Outcomes ---\n"
+    + "\n".join(f"- {label}: {desc}" for label, desc in OUTCOMES if label != "Study ID")
+    + "\n\nRule: Convert as many possible percentage numbers into whole numbers (as ratios/mean ± std etc.) where denominators are available.\n"
+    "\nReturn ONLY the JSON object. No markdown formatting, no preamble."
+)
+
+def load_state():
+    """Loads the accumulated results, preferring the fast Parquet state over the xlsx."""
+    if os.path.exists(STATE_FILE):
+        return pd.read_parquet(STATE_FILE)
+    if os.path.exists(OUTPUT_FILE):
+        return pd.read_excel(OUTPUT_FILE)
+    return None
+
+def save_state(df):
+    """Persists the accumulated results to the Parquet state (xlsx is rendered once at the end)."""
+    try:
+        df.to_parquet(STATE_FILE, engine='pyarrow', compression='zstd')
+    except Exception as e:
+        print(f"Warning: Parquet state write failed ({e}). Falling back to xlsx.")
+        df.to_excel(OUTPUT_FILE, index=False)
 
 def extract_with_api(pdf_path, prompt, model):
     print(f"[{os.path.basename(pdf_path)}] Uploading to Gemini...")
@@ -121,16 +133,16 @@ def main():
 
     genai.configure(api_key=args.key)
     model = genai.GenerativeModel(MODEL_NAME)
-    prompt = create_prompt()
+    prompt = PROMPT_TEXT
 
     if args.files:
         files_to_process = [os.path.join(ARTICLES_DIR, f) for f in args.files if os.path.exists(os.path.join(ARTICLES_DIR, f))]
     else:
         files_to_process = [os.path.join(ARTICLES_DIR, f) for f in os.listdir(ARTICLES_DIR) if f.lower().endswith('.pdf')]
         
-        if os.path.exists(OUTPUT_FILE):
+        if os.path.exists(STATE_FILE) or os.path.exists(OUTPUT_FILE):
             try:
-                processed = set(pd.read_excel(OUTPUT_FILE)['Source File'].dropna().tolist())
+                processed = set(load_state()['Source File'].dropna().tolist())
                 files_to_process = [f for f in files_to_process if os.path.basename(f) not in processed]
             except:
                 pass
@@ -146,22 +158,27 @@ def main():
             data = extract_with_api(pdf_path, prompt, model)
             
         if data and data != "RETRY":
-            df = pd.DataFrame([data])
-            for c in ALL_COLUMNS:
-                if c not in df.columns: df[c] = None
-            
-            cols = ['Source File'] + [c for c in ALL_COLUMNS if c in df.columns]
-            df = df[cols]
+            # Single reindex allocates all columns at once instead of one insert per missing column
+            df = pd.DataFrame([data]).reindex(columns=['Source File'] + ALL_COLUMNS)
 
-            if os.path.exists(OUTPUT_FILE):
-                existing = pd.read_excel(OUTPUT_FILE)
+            existing = load_state()
+            if existing is not None:
                 df = pd.concat([existing, df], ignore_index=True)
-            
-            df.to_excel(OUTPUT_FILE, index=False)
+
+            save_state(df)
             print(f"  💾 Saved {os.path.basename(pdf_path)}")
             time.sleep(4)
         else:
             print(f"  ❌ Failed {os.path.basename(pdf_path)}")
 
+    # Render the human-facing xlsx once at the end instead of on every save
+    final_df = load_state()
+    if final_df is not None:
+        try:
+            # xlsxwriter serializes large sheets several times faster than openpyxl
+            final_df.to_excel(OUTPUT_FILE, index=False, engine='xlsxwriter')
+        except ImportError:
+            final_df.to_excel(OUTPUT_FILE, index=False)
+
 if __name__ == "__main__":
     main()
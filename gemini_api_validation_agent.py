@@ -15,6 +15,7 @@ init(autoreset=True)
 ARTICLES_DIR = 'Articles'
 INPUT_FILE = 'extracted_studies.xlsx'
 VALIDATION_LOG = 'validation_discrepancies.xlsx'
+VALIDATION_STATE = 'validation_discrepancies.parquet'
 MODEL_NAME = "models/gemini-2.0-flash"
 
 def create_validation_prompt(row_data):
@@ -125,9 +126,22 @@ def main():
                             'Description': d.get('description'),
                             'Severity': d.get('severity')
                         })
-            pd.DataFrame(flattened).to_excel(VALIDATION_LOG, index=False)
+            try:
+                pd.DataFrame(flattened).to_parquet(VALIDATION_STATE, engine='pyarrow', compression='zstd')
+            except Exception as e:
+                print(f"Warning: Parquet state write failed ({e}). Falling back to xlsx.")
+                pd.DataFrame(flattened).to_excel(VALIDATION_LOG, index=False)
             time.sleep(4)
 
+    # Render the human-facing xlsx log once at the end
+    if os.path.exists(VALIDATION_STATE):
+        final_df = pd.read_parquet(VALIDATION_STATE)
+        try:
+            # xlsxwriter serializes large sheets several times faster than openpyxl
+            final_df.to_excel(VALIDATION_LOG, index=False, engine='xlsxwriter')
+        except ImportError:
+            final_df.to_excel(VALIDATION_LOG, index=False)
+
     print("API Validation Complete.")
 
 if __name__ == "__main__":
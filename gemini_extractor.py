@@ -2,6 +2,11 @@
 import os
 import time
 import json
+import hashlib
+import queue
+import threading
+import concurrent.futures
+import openpyxl
 import pandas as pd
 import argparse
 import re
@@ -15,6 +20,9 @@ init(autoreset=True)
 # Configuration
 ARTICLES_DIR = 'Articles'
 OUTPUT_FILE = 'extracted_studies.xlsx'
+STATE_FILE = 'extracted_studies.parquet'
+RESULTS_LOG = 'extracted_studies.jsonl'
+HASH_FILE = 'extracted_hashes.json'
 GEMINI_URL = "https://gemini.google.com/app"
 
 # Column Definitions
@@ -67,80 +75,84 @@ OUTCOMES = [
 
 ALL_COLUMNS = [c[0] for c in STUDY_CHARACTERISTICS] + [c[0] for c in OUTCOMES if c[0] != "Study ID"]
 
-def create_prompt():
-    prompt = "Extract the following information from the attached PDF. Return the result as a valid JSON object where keys are the 'Column Label' and values are the extracted text. If information is missing, use null.\n\n"
-    prompt += "--- Study Characteristics ---\n"
-    for label, desc in STUDY_CHARACTERISTICS:
-        prompt += f"- {label}: {desc}\n"
-    
-    prompt += "\n--- Outcomes ---\n"
-    for label, desc in OUTCOMES:
-        if label == "Study ID": continue 
-        prompt += f"- {label}: {desc}\n"
-    
-    prompt += "\n\nRule: Convert as many possible percentage numbers into whole numbers(as ratios/mean+- std etc."
+# Shared decoder: raw_decode pulls the first complete JSON object in one linear pass
+_JSON_DECODER = json.JSONDecoder()
 
+# Selector unions: one locator query matches any candidate in a single round-trip
+PLUS_SELECTOR = ", ".join([
+    "button[aria-label*='Upload']",
+    "button[aria-label*='Add files']",
+    "button[aria-label*='file menu']",
+    "mat-icon:has-text('add')",
+    "span:has-text('add')"
+])
+UPLOAD_ITEM_SELECTOR = ", ".join([
+    "div[role='menuitem']:has-text('Upload')",
+    "span:has-text('Upload')",
+    "li:has-text('Upload')",
+    "[aria-label*='Upload']",
+    ".mat-mdc-menu-item:has-text('Upload')"
+])
+NEW_CHAT_SELECTOR = "button:has-text('New chat'), a:has-text('New chat')"
 
-    prompt += "\n\nCRUCIAL: Verify the extracted data against the PDF one more time before outputting to ensure accuracy. Return ONLY the JSON object, no markdown formatting."
-    return prompt
+# The prompt is deterministic per run, so build it once at import time
+PROMPT_TEXT = (
+    "Extract the following information from the attached PDF. Return the result as a valid JSON object where keys are the 'Column Label' and values are the extracted text. If information is missing, use null.\n\n"
+    "--- Study Characteristics ---\n"
+    + "\n".join(f"- {label}: {desc}" for label, desc in STUDY_CHARACTERISTICS)
+    + "\n\n--- Outcomes ---\n"
+    + "\n".join(f"- {label}: {desc}" for label, desc in OUTCOMES if label != "Study ID")
+    + "\n\n\nRule: Convert as many possible percentage numbers into whole numbers(as ratios/mean+- std etc."
+    "\n\nCRUCIAL: Verify the extracted data against the PDF one more time before outputting to ensure accuracy. Return ONLY the JSON object, no markdown formatting."
+)
 
-def extract_data_from_page(page, pdf_path, prompt_text):
-    print(f"[{os.path.basename(pdf_path)}] Navigating to Gemini...")
+def reset_to_new_chat(page):
+    """Starts a fresh conversation on the existing page (a cheap client-side route change)."""
     try:
-        page.goto(GEMINI_URL, timeout=90000, wait_until="domcontentloaded")
+        page.locator(NEW_CHAT_SELECTOR).first.click(timeout=10000)
+        page.locator("div[contenteditable='true'], textarea").first.wait_for(state="visible", timeout=15000)
+        return True
     except:
-        print("Page load slow, continuing...")
+        return False
+
+def extract_data_from_page(page, pdf_path, prompt_text):
+    name = os.path.basename(pdf_path)
+    # Only pay a full navigation when the page is not already on Gemini
+    if "gemini.google.com" not in page.url:
+        print(f"[{name}] Navigating to Gemini...")
+        try:
+            page.goto(GEMINI_URL, timeout=90000, wait_until="domcontentloaded")
+        except:
+            print("Page load slow, continuing...")
 
     # Upload Logic
-    print(f"[{os.path.basename(pdf_path)}] Attempting upload...")
+    print(f"[{name}] Attempting upload...")
     try:
-        # Give the UI a moment to settle
-        time.sleep(2)
-        
+        # Wait for the composer to be interactive rather than sleeping blindly
+        page.locator("div[contenteditable='true'], textarea").first.wait_for(state="visible", timeout=15000)
+
         with page.expect_file_chooser(timeout=60000) as fc_info:
-            plus_selectors = [
-                 "button[aria-label*='Upload']",
-                 "button[aria-label*='Add files']",
-                 "button[aria-label*='file menu']",
-                 "mat-icon:has-text('add')",
-                 "span:has-text('add')"
-            ]
-            
-            plus_found = False
-            for selector in plus_selectors:
-                btn = page.locator(selector).first
-                if btn.count() > 0 and btn.is_visible():
-                    print(f"[{os.path.basename(pdf_path)}] Found button with selector: {selector}")
-                    btn.click(force=True, timeout=10000)
-                    plus_found = True
-                    break
-            
-            if not plus_found:
-                print(f"[{os.path.basename(pdf_path)}] Plus button not found.")
+            # Single union query instead of probing each candidate selector in turn
+            try:
+                btn = page.locator(PLUS_SELECTOR).first
+                btn.wait_for(state="visible", timeout=10000)
+                btn.click(force=True, timeout=10000)
+            except:
+                print(f"[{name}] Plus button not found.")
                 return None
-            
-            time.sleep(2)
-            
-            # Clcik the 'Upload' item with retries
-            upload_selectors = [
-                 "div[role='menuitem']:has-text('Upload')",
-                 "span:has-text('Upload')",
-                 "li:has-text('Upload')",
-                 "[aria-label*='Upload']",
-                 ".mat-mdc-menu-item:has-text('Upload')"
-            ]
 
+            # The menu item wait below gates on the menu actually opening
+
+            # Click the 'Upload' item (union query, then text fallback)
             upload_found = False
-            for target in upload_selectors:
-                try:
-                     upload_item = page.locator(target).first
-                     if upload_item.count() > 0 and upload_item.is_visible():
-                         upload_item.click(force=True, timeout=5000)
-                         upload_found = True
-                         break
-                except:
-                     continue
-            
+            try:
+                upload_item = page.locator(UPLOAD_ITEM_SELECTOR).first
+                upload_item.wait_for(state="visible", timeout=5000)
+                upload_item.click(force=True, timeout=5000)
+                upload_found = True
+            except:
+                pass
+
             if not upload_found:
                  # Fallback
                  try:
@@ -151,110 +163,466 @@ def extract_data_from_page(page, pdf_path, prompt_text):
                     pass
 
             if not upload_found:
-                 print(f"[{os.path.basename(pdf_path)}] Upload menu item not found.")
+                 print(f"[{name}] Upload menu item not found.")
                  return None
         
         file_chooser = fc_info.value
         file_chooser.set_files(pdf_path)
         
         # SMART WAIT FOR UPLOAD
-        print(f"[{os.path.basename(pdf_path)}] Uploading...")
+        print(f"[{name}] Uploading...")
         try:
             page.locator("file-chip, .file-name, [aria-label*='file']").first.wait_for(state="visible", timeout=60000)
-            time.sleep(2)
         except:
-            time.sleep(15)
-        
+            print(f"[{name}] Upload indicator not detected; continuing.")
+
     except Exception as e:
-        print(f"[{os.path.basename(pdf_path)}] Upload failed: {e}")
+        print(f"[{name}] Upload failed: {e}")
         return None
 
     # Prompting
     try:
         text_area = page.locator("div[contenteditable='true'], textarea").first
         text_area.fill(prompt_text)
-        time.sleep(1)
         text_area.press("Enter")
-        print(f"[{os.path.basename(pdf_path)}] Prompt sent. Waiting for response...")
-        
-        # SMART WAIT FOR RESPONSE
-        stop_btn = page.locator("button[aria-label*='Stop'], button[aria-label*='Interrupt']")
-        time.sleep(5)
-        for _ in range(120):
-            if stop_btn.count() == 0 or not stop_btn.is_visible():
-                response_elements = page.locator("model-response, .model-response-text")
-                if response_elements.count() > 0:
-                    time.sleep(2)
-                    break
+        print(f"[{name}] Prompt sent. Waiting for response...")
+
+        # SMART WAIT FOR RESPONSE: the Stop button is visible while generating,
+        # so wait for it to appear and then to go away instead of polling sleeps
+        stop_btn = page.locator("button[aria-label*='Stop'], button[aria-label*='Interrupt']").first
+        response_elements = page.locator("model-response, .model-response-text")
+        deadline = time.monotonic() + 120
+        try:
+            stop_btn.wait_for(state="visible", timeout=15000)
+        except:
+            pass
+        try:
+            stop_btn.wait_for(state="hidden", timeout=120000)
+        except:
+            pass
+
+        # A detached Stop button also reads as "hidden" (e.g. when it never
+        # appeared within 15s), so completion is additionally gated on a
+        # response element existing — keep waiting out the same 120s budget
+        while response_elements.count() == 0 and time.monotonic() < deadline:
             time.sleep(1)
-        
+
         # Extract Response
-        response_elements = page.locator("model-response, .model-response-text") 
+        try:
+            response_elements.last.wait_for(state="visible", timeout=10000)
+        except:
+            pass
         if response_elements.count() > 0:
             last_response = response_elements.all()[-1].inner_text()
         else:
-            time.sleep(10)
             last_response = page.content()
 
-        # Parse JSON
+        # Parse JSON (first complete object, no second rfind scan over the response)
         start = last_response.find('{')
-        end = last_response.rfind('}') + 1
-        if start != -1 and end != -1:
-            json_str = last_response[start:end]
+        if start != -1:
             try:
-                data = json.loads(json_str)
-                data['Source File'] = os.path.basename(pdf_path)
+                data, _ = _JSON_DECODER.raw_decode(last_response, start)
+                data['Source File'] = name
                 return data
-            except:
-                print(f"[{os.path.basename(pdf_path)}] JSON parsing failed.")
+            except json.JSONDecodeError:
+                print(f"[{name}] JSON parsing failed.")
                 return None
         else:
             return None
 
     except Exception as e:
-        print(f"[{os.path.basename(pdf_path)}] Interaction failed: {e}")
+        print(f"[{name}] Interaction failed: {e}")
         return None
 
 def process_study_single_pass(context, pdf_path, prompt_text):
-    print(f"\n--- Processing {os.path.basename(pdf_path)} ---")
-    page = context.new_page()
+    name = os.path.basename(pdf_path)
+    print(f"\n--- Processing {name} ---")
+    # Reuse the logged-in page: "New chat" resets conversation state without
+    # the multi-second SPA re-init a fresh tab would pay per PDF.
+    page = context.pages[0] if context.pages else context.new_page()
+    if not reset_to_new_chat(page):
+        print(f"[{name}] 'New chat' not found; falling back to full navigation.")
+        try:
+            page.goto(GEMINI_URL, timeout=90000, wait_until="domcontentloaded")
+        except:
+            pass
+    data = extract_data_from_page(page, pdf_path, prompt_text)
+    return [data] if data else []
+
+def read_workbook(path):
+    """Reads an xlsx sheet into a DataFrame.
+
+    Prefers the Rust-based calamine engine (pandas >= 2.2, needs
+    python-calamine); falls back to openpyxl read-only streaming.
+    """
+    try:
+        return pd.read_excel(path, engine='calamine')
+    except (ImportError, ValueError):
+        pass
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
     try:
-        data = extract_data_from_page(page, pdf_path, prompt_text)
-        return [data] if data else []
+        rows = wb.active.values
+        header = next(rows, None)
+        return pd.DataFrame(rows, columns=header)
     finally:
-        # User requested "new tab" originally, but usually we close to save resources.
-        # "Extract response for each article only once"
-        # I will close it to keep browser clean, unless debugging.
-        # Given 20 files, keeping 20 tabs might crash.
-        page.close()
+        wb.close()
+
+def write_workbook(df, path):
+    """Writes a DataFrame to xlsx, streaming rows in constant memory.
+
+    Prefers xlsxwriter's constant_memory mode (rows go straight to disk);
+    falls back to openpyxl write-only streaming.
+    """
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+
+    if xlsxwriter is not None:
+        wb = xlsxwriter.Workbook(path, {'constant_memory': True})
+        ws = wb.add_worksheet()
+        ws.write_row(0, 0, [str(c) for c in df.columns])
+        for i, row in enumerate(df.itertuples(index=False, name=None), start=1):
+            ws.write_row(i, 0, [None if pd.isna(v) else v for v in row])
+        wb.close()
+        return
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        ws.append([None if pd.isna(v) else v for v in row])
+    wb.save(path)
+
+def load_state():
+    """Loads the accumulated results, preferring the fast Parquet state over the xlsx."""
+    if os.path.exists(STATE_FILE):
+        return pd.read_parquet(STATE_FILE)
+    if os.path.exists(OUTPUT_FILE):
+        return read_workbook(OUTPUT_FILE)
+    return None
+
+def save_state(df):
+    """Persists the accumulated results to the Parquet state (xlsx is rendered once at the end)."""
+    try:
+        df.to_parquet(STATE_FILE, engine='pyarrow', compression='zstd')
+    except Exception as e:
+        print(f"Warning: Parquet state write failed ({e}). Falling back to xlsx.")
+        write_workbook(df, OUTPUT_FILE)
+
+def append_results_log(results):
+    """Appends extraction results to the crash-safe JSONL sidecar (O(1) per study)."""
+    with open(RESULTS_LOG, 'a', encoding='utf-8') as f:
+        for data in results:
+            f.write(json.dumps(data, ensure_ascii=False, default=str) + '\n')
+
+def fold_results_log():
+    """Folds results from the JSONL sidecar into the state, then clears the sidecar."""
+    if not os.path.exists(RESULTS_LOG):
+        return
+    results = []
+    with open(RESULTS_LOG, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    results.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    if results:
+        # Single reindex allocates all columns at once instead of one insert per missing column
+        df = pd.DataFrame(results).reindex(columns=['Source File'] + ALL_COLUMNS)
+
+        existing = load_state()
+        if existing is not None:
+            df = pd.concat([existing, df], ignore_index=True)
+        save_state(df)
+    os.remove(RESULTS_LOG)
+
+def pdf_hash(path):
+    """Content hash of a PDF (first MB is enough for uniqueness in practice)."""
+    with open(path, 'rb') as f:
+        return hashlib.blake2b(f.read(1 << 20)).hexdigest()[:16]
+
+def load_extracted_hashes():
+    """Loads the hash → source file map of already-extracted PDFs."""
+    if os.path.exists(HASH_FILE):
+        try:
+            with open(HASH_FILE, encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not read {HASH_FILE}: {e}")
+    return {}
+
+def record_extracted_hash(pdf_path):
+    """Records a successfully extracted PDF's content hash in the sidecar."""
+    try:
+        hashes = load_extracted_hashes()
+        hashes[pdf_hash(pdf_path)] = os.path.basename(pdf_path)
+        with open(HASH_FILE, 'w', encoding='utf-8') as f:
+            json.dump(hashes, f, indent=2)
+    except Exception as e:
+        print(f"Warning: Could not update {HASH_FILE}: {e}")
+
+def discard_extracted_hashes(basenames):
+    """Drops the given source files' hashes so their PDFs can be re-extracted.
+
+    Must be called whenever a file's rows are removed from the output (e.g.
+    the healing cleanup in do_it_all); otherwise the stale hash would make
+    every later run skip the PDF even though its data is gone.
+    """
+    hashes = load_extracted_hashes()
+    if not hashes:
+        return
+    targets = set(basenames)
+    kept = {h: f for h, f in hashes.items() if f not in targets}
+    if len(kept) < len(hashes):
+        try:
+            with open(HASH_FILE, 'w', encoding='utf-8') as f:
+                json.dump(kept, f, indent=2)
+        except Exception as e:
+            print(f"Warning: Could not update {HASH_FILE}: {e}")
 
 def get_pdf_files():
     files = [f for f in os.listdir(ARTICLES_DIR) if f.lower().endswith('.pdf')]
-    return [os.path.join(ARTICLES_DIR, f) for f in files]
+    pdf_paths = [os.path.join(ARTICLES_DIR, f) for f in files]
+
+    # Skip PDFs whose content was already extracted, even if renamed since
+    extracted = load_extracted_hashes()
+    if extracted:
+        remaining = []
+        for p in pdf_paths:
+            try:
+                if pdf_hash(p) in extracted:
+                    continue
+            except OSError:
+                pass
+            remaining.append(p)
+        if len(remaining) < len(pdf_paths):
+            print(f"Skipping {len(pdf_paths) - len(remaining)} PDFs already extracted by content hash.")
+        pdf_paths = remaining
+    return pdf_paths
+
+def launch_and_login(p, browser_channel, user_data_dir):
+    """Launches a persistent browser context and waits for Gemini login.
+
+    Returns the logged-in context, or None on failure/timeout.
+    """
+    print(f"Launching {browser_channel} with profile: {user_data_dir}")
+
+    try:
+        print(f"Launching {browser_channel}...")
+        browser = p.chromium.launch_persistent_context(
+            user_data_dir,
+            headless=False,
+            channel=browser_channel,
+            args=[
+                "--disable-blink-features=AutomationControlled",
+                "--start-maximized",
+                "--no-sandbox",
+                "--disable-infobars",
+                "--disable-extensions",
+                "--disable-notifications",
+                "--no-first-run",
+                "--no-default-browser-check"
+            ],
+            ignore_default_args=["--enable-automation"],
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            slow_mo=50
+        )
+
+        # Setup first page
+        if browser.pages:
+            page = browser.pages[0]
+        else:
+            page = browser.new_page()
+
+        page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+
+        # Navigate with retry
+        print(f"Navigating to {GEMINI_URL}...")
+        for attempt in range(3):
+            try:
+                page.goto(GEMINI_URL, timeout=60000, wait_until="load")
+                break
+            except Exception as e:
+                if attempt == 2: raise
+                print(f"Retry {attempt+1} due to: {e}")
+                time.sleep(2)
 
-def main(limit=None, browser_channel="chrome", files_to_process=None):
+    except Exception as e:
+        print(f"Failed to launch or navigate: {e}")
+        return None
+
+    # Automated polling for login
+    login_detected = False
+    print("\n" + "="*50)
+    print("AUTOMATED LOGIN WAIT (Extractor)")
+    print("Please log into Gemini in the opened browser window.")
+    print("The agent will automatically start extraction when logged in...")
+    print("="*50 + "\n")
+
+    try:
+        print(f"Navigating to {GEMINI_URL}...")
+        page.goto(GEMINI_URL, timeout=60000, wait_until="domcontentloaded")
+    except Exception as e:
+        print(f"Warning: Initial page load slow/failed: {e}")
+        page.screenshot(path="extractor_load_error.png")
+        print("Took 'extractor_load_error.png' for diagnosis.")
+
+    for i in range(120): # Wait up to 10 minutes
+        try:
+            # Polling for elements
+            prompt_area = page.locator("div[contenteditable='true'], textarea").first
+            new_chat = page.locator("button:has-text('New chat'), a:has-text('New chat')").first
+
+            if prompt_area.is_visible() or new_chat.is_visible():
+                print("\n[SUCCESS] Login detected! Starting extraction...")
+                time.sleep(2)
+                login_detected = True
+                break
+        except:
+            pass
+
+        if i % 6 == 0:
+            print(f"Still waiting for login... ({i*5}s elapsed)")
+        time.sleep(5)
+
+    if not login_detected:
+        print("Login detection timed out.")
+        return None
+
+    return browser
+
+def finalize_output():
+    """Folds the run's results into the state and renders the human-facing xlsx once."""
+    fold_results_log()
+    final_df = load_state()
+    if final_df is not None:
+        write_workbook(final_df, OUTPUT_FILE)
+
+class Extractor:
+    """Browser-based extractor holding one logged-in Playwright session.
+
+    Use as a context manager so several extraction passes (e.g. the healing
+    re-extraction in do_it_all.py) reuse the same browser and login state
+    instead of paying the cold-start and login wait per pass.
+    """
+    def __init__(self, browser_channel="chrome"):
+        self.browser_channel = browser_channel
+        self._playwright = None
+        self.browser = None
+
+    def __enter__(self):
+        self._playwright = sync_playwright().start()
+        # Move profile out of OneDrive to prevent locking/sync issues
+        user_data_dir = os.path.join("C:\\Users\\HP", f"gemini_{self.browser_channel}_profile")
+        self.browser = launch_and_login(self._playwright, self.browser_channel, user_data_dir)
+        if self.browser is None:
+            self._playwright.stop()
+            self._playwright = None
+            raise RuntimeError("Browser launch or Gemini login failed.")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+            self.browser = None
+        if self._playwright is not None:
+            self._playwright.stop()
+            self._playwright = None
+        return False
+
+    def extract_files(self, pdf_files, prompt_text=None):
+        """Extracts the given PDFs with the already-logged-in session and updates the output."""
+        prompt_text = prompt_text or PROMPT_TEXT
+
+        pbar = tqdm(pdf_files, desc=f"{Fore.YELLOW}Total Progress", unit="study")
+        for pdf_path in pbar:
+            filename = os.path.basename(pdf_path)
+            pbar.set_postfix_str(f"{Fore.CYAN}Processing: {filename[:20]}...")
+
+            study_results = process_study_single_pass(self.browser, pdf_path, prompt_text)
+
+            if study_results:
+                # Save Incremental (cheap append; the workbook is built once at the end)
+                append_results_log(study_results)
+                record_extracted_hash(pdf_path)
+            else:
+                print(f"\n{Fore.RED}✘ Failed to extract data for {filename}")
+
+        # Fold this run's results into the state and render the xlsx once
+        finalize_output()
+
+def run_parallel(pdf_files, prompt_text, browser_channel, workers):
+    """Fans PDFs out to several browser contexts, each driven by its own thread.
+
+    Extraction is I/O-bound (uploads + Gemini latency), so wall time scales
+    roughly with the number of contexts. Each worker thread owns its own
+    Playwright instance and persistent profile (sync API is not thread-safe).
+    """
+    work_queue = queue.Queue()
+    for pdf_path in pdf_files:
+        work_queue.put(pdf_path)
+
+    results_lock = threading.Lock()
+    pbar = tqdm(total=len(pdf_files), desc=f"{Fore.YELLOW}Total Progress", unit="study")
+
+    def worker(worker_id):
+        with sync_playwright() as p:
+            user_data_dir = os.path.join("C:\\Users\\HP", f"gemini_{browser_channel}_profile_{worker_id}")
+            browser = launch_and_login(p, browser_channel, user_data_dir)
+            if browser is None:
+                return
+            try:
+                while True:
+                    try:
+                        pdf_path = work_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    study_results = process_study_single_pass(browser, pdf_path, prompt_text)
+                    if study_results:
+                        with results_lock:
+                            append_results_log(study_results)
+                            record_extracted_hash(pdf_path)
+                    else:
+                        tqdm.write(f"{Fore.RED}✘ Failed to extract data for {os.path.basename(pdf_path)}")
+                    pbar.update(1)
+            finally:
+                browser.close()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(worker, i) for i in range(workers)]
+        for future in futures:
+            future.result()
+    pbar.close()
+
+def main(limit=None, browser_channel="chrome", files_to_process=None, workers=1):
     if not os.path.exists(ARTICLES_DIR):
         print(f"Error: Directory {ARTICLES_DIR} does not exist.")
         return
 
+    # Recover any results a previous crashed run left in the JSONL sidecar
+    fold_results_log()
+
     if files_to_process:
         print(f"Targeted mode: Processing {len(files_to_process)} specific files.")
         pdf_files = [os.path.join(ARTICLES_DIR, f) for f in files_to_process if os.path.exists(os.path.join(ARTICLES_DIR, f))]
     else:
         pdf_files = get_pdf_files()
         # Resume Skip Logic
-        if os.path.exists(OUTPUT_FILE):
+        if os.path.exists(STATE_FILE) or os.path.exists(OUTPUT_FILE):
             try:
-                existing_df = pd.read_excel(OUTPUT_FILE)
+                existing_df = load_state()
                 if 'Source File' in existing_df.columns:
-                    processed_files = set(existing_df['Source File'].dropna().astype(str).tolist())
-                    files_to_skip = []
-                    for pf in pdf_files:
-                        basename = os.path.basename(pf)
-                        if any(basename in str(recorded) for recorded in processed_files):
-                            files_to_skip.append(pf)
-                    pdf_files = [f for f in pdf_files if f not in files_to_skip]
-                    print(f"Skipping {len(files_to_skip)} already processed files. {len(pdf_files)} remaining.")
+                    # Hashed set membership on basenames: O(N+M) instead of a substring scan per pair
+                    processed_basenames = {os.path.basename(str(r)) for r in existing_df['Source File'].dropna()}
+                    remaining = [f for f in pdf_files if os.path.basename(f) not in processed_basenames]
+                    print(f"Skipping {len(pdf_files) - len(remaining)} already processed files. {len(remaining)} remaining.")
+                    pdf_files = remaining
             except Exception as e:
                 print(f"Warning: Could not read existing output file for resume logic: {e}")
 
@@ -263,138 +631,40 @@ def main(limit=None, browser_channel="chrome", files_to_process=None):
     
     print(f"Total PDFs to process: {len(pdf_files)}")
 
-    prompt_text = create_prompt()
-    all_results = []
-
-    with sync_playwright() as p:
-        profile_name = f"{browser_channel}_profile"
-        # Move profile out of OneDrive to prevent locking/sync issues
-        user_data_dir = os.path.join("C:\\Users\\HP", f"gemini_{profile_name}")
-        print(f"Launching {browser_channel} with profile: {user_data_dir}")
-        
-        try:
-            print(f"Launching {browser_channel}...")
-            browser = p.chromium.launch_persistent_context(
-                user_data_dir, 
-                headless=False, 
-                channel=browser_channel, 
-                args=[
-                    "--disable-blink-features=AutomationControlled",
-                    "--start-maximized",
-                    "--no-sandbox",
-                    "--disable-infobars",
-                    "--disable-extensions",
-                    "--disable-notifications",
-                    "--no-first-run",
-                    "--no-default-browser-check"
-                ],
-                ignore_default_args=["--enable-automation"],
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                slow_mo=50
-            )
-            
-            # Setup first page
-            if browser.pages:
-                page = browser.pages[0]
-            else:
-                page = browser.new_page()
-                
-            page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            
-            # Navigate with retry
-            print(f"Navigating to {GEMINI_URL}...")
-            for attempt in range(3):
-                try:
-                    page.goto(GEMINI_URL, timeout=60000, wait_until="load")
-                    break
-                except Exception as e:
-                    if attempt == 2: raise
-                    print(f"Retry {attempt+1} due to: {e}")
-                    time.sleep(2)
-
-        except Exception as e:
-            print(f"Failed to launch or navigate: {e}")
-            return
-        
-        # Automated polling for login
-        login_detected = False
-        print("\n" + "="*50)
-        print("AUTOMATED LOGIN WAIT (Extractor)")
-        print("Please log into Gemini in the opened browser window.")
-        print("The agent will automatically start extraction when logged in...")
-        print("="*50 + "\n")
-        
-        try:
-            print(f"Navigating to {GEMINI_URL}...")
-            page.goto(GEMINI_URL, timeout=60000, wait_until="domcontentloaded")
-        except Exception as e:
-            print(f"Warning: Initial page load slow/failed: {e}")
-            page.screenshot(path="extractor_load_error.png")
-            print("Took 'extractor_load_error.png' for diagnosis.")
-
-        for i in range(120): # Wait up to 10 minutes
-            try:
-                # Polling for elements
-                prompt_area = page.locator("div[contenteditable='true'], textarea").first
-                new_chat = page.locator("button:has-text('New chat'), a:has-text('New chat')").first
-                
-                if prompt_area.is_visible() or new_chat.is_visible():
-                    print("\n[SUCCESS] Login detected! Starting extraction...")
-                    time.sleep(2)
-                    login_detected = True
-                    break
-            except:
-                pass
-            
-            if i % 6 == 0:
-                print(f"Still waiting for login... ({i*5}s elapsed)")
-            time.sleep(5)
-            
-        if not login_detected:
-            print("Login detection timed out. Exiting.")
-            return
+    prompt_text = PROMPT_TEXT
 
+    workers = int(workers) if workers else 1
+    if workers > 1:
         print(f"\n{Fore.CYAN}{'='*60}")
-        print(f"{Fore.CYAN}🚀 STARTING DATA EXTRACTION")
+        print(f"{Fore.CYAN}🚀 STARTING DATA EXTRACTION ({workers} parallel contexts)")
         print(f"{Fore.CYAN}{'='*60}\n")
-
-        # Process Files with Progress Bar
-        pbar = tqdm(pdf_files, desc=f"{Fore.YELLOW}Total Progress", unit="study")
-        for pdf_path in pbar:
-            filename = os.path.basename(pdf_path)
-            pbar.set_postfix_str(f"{Fore.CYAN}Processing: {filename[:20]}...")
-            
-            study_results = process_study_single_pass(browser, pdf_path, prompt_text)
-            
-            if study_results:
-                all_results.extend(study_results)
-                
-                # Save Incremental
-                df = pd.DataFrame(study_results)
-                for c in ALL_COLUMNS:
-                    if c not in df.columns: df[c] = None
-                
-                cols = ['Source File'] + [c for c in ALL_COLUMNS if c in df.columns]
-                df = df[cols]
-
-                if os.path.exists(OUTPUT_FILE):
-                    existing = pd.read_excel(OUTPUT_FILE)
-                    df = pd.concat([existing, df], ignore_index=True)
-                
-                df.to_excel(OUTPUT_FILE, index=False)
-                # No longer printing every save line to keep UI clean
-            else:
-                print(f"\n{Fore.RED}✘ Failed to extract data for {filename}")
-
+        run_parallel(pdf_files, prompt_text, browser_channel, workers)
+        finalize_output()
         print(f"\n{Fore.GREEN}{'='*60}")
-        print(f"{Fore.GREEN}✨ EXTRACTION COMPLETE! Browser remains open.")
+        print(f"{Fore.GREEN}✨ EXTRACTION COMPLETE!")
         print(f"{Fore.GREEN}{'='*60}")
-        time.sleep(5)
+        return
+
+    try:
+        with Extractor(browser_channel) as extractor:
+            print(f"\n{Fore.CYAN}{'='*60}")
+            print(f"{Fore.CYAN}🚀 STARTING DATA EXTRACTION")
+            print(f"{Fore.CYAN}{'='*60}\n")
+
+            extractor.extract_files(pdf_files, prompt_text)
+
+            print(f"\n{Fore.GREEN}{'='*60}")
+            print(f"{Fore.GREEN}✨ EXTRACTION COMPLETE! Browser remains open.")
+            print(f"{Fore.GREEN}{'='*60}")
+            time.sleep(5)
+    except RuntimeError as e:
+        print(e)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--limit", help="Limit number of files to process", default=None)
     parser.add_argument("--browser", help="Browser channel (chrome, msedge)", default="chrome")
     parser.add_argument("--files", help="Specific files to process", nargs="+", default=None)
+    parser.add_argument("--workers", help="Number of parallel browser contexts", default=1)
     args = parser.parse_args()
-    main(limit=args.limit, browser_channel=args.browser, files_to_process=args.files)
+    main(limit=args.limit, browser_channel=args.browser, files_to_process=args.files, workers=args.workers)
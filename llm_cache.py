@@ -0,0 +1,113 @@
+
+import os
+import json
+import sqlite3
+import hashlib
+
+# Disk cache for Gemini validation responses. Keyed by the PDF bytes and the
+# exact prompt, so a rerun only hits the browser for rows that actually changed.
+CACHE_DIR = os.path.join('.cache', 'validation')
+
+# Semantic near-match layer: rows whose extracted data differs only in
+# formatting still hit the cache if their embeddings are close enough.
+SEMANTIC_DB = os.path.join(CACHE_DIR, 'semantic.db')
+SEMANTIC_THRESHOLD = 0.95
+
+def make_key(pdf_path, prompt_text, version="v1"):
+    """Builds the cache key: sha256(pdf bytes) : sha256(version + prompt)."""
+    with open(pdf_path, 'rb') as f:
+        pdf_sha = hashlib.sha256(f.read()).hexdigest()
+    prompt_sha = hashlib.sha256(f"{version}:{prompt_text}".encode('utf-8')).hexdigest()
+    return f"{pdf_sha}:{prompt_sha}"
+
+def _path(key):
+    # ':' is not a legal filename character on Windows
+    return os.path.join(CACHE_DIR, key.replace(':', '_') + '.json')
+
+def get(key):
+    """Returns the cached result dict for key, or None on miss/corruption."""
+    path = _path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def set(key, result):
+    """Stores a result dict under key. Failures are non-fatal (cache is best-effort)."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(_path(key), 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+    except Exception as e:
+        print(f"Warning: Could not write LLM cache entry: {e}")
+
+_model = None
+_model_failed = False
+
+def _embedder():
+    """Lazily loads the sentence-transformer model; disables itself if unavailable."""
+    global _model, _model_failed, np
+    if _model is None and not _model_failed:
+        try:
+            # numpy rides in with sentence-transformers, so it is imported
+            # here too: without the model the semantic layer never runs and
+            # the exact-match cache must keep working on a numpy-less install
+            import numpy as np
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer('all-MiniLM-L6-v2')
+        except Exception:
+            _model_failed = True
+    return _model
+
+def _embed(text):
+    model = _embedder()
+    if model is None:
+        return None
+    vec = model.encode([text], normalize_embeddings=True)[0]
+    return np.asarray(vec, dtype=np.float32)
+
+def _semantic_conn():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(SEMANTIC_DB)
+    conn.execute("CREATE TABLE IF NOT EXISTS entries (pdf_sha TEXT, embedding BLOB, result TEXT)")
+    return conn
+
+def semantic_get(pdf_sha, text):
+    """Returns a prior result for the same PDF whose data embeds within the
+    similarity threshold of text, or None. Embeddings are normalized, so the
+    dot product is the cosine similarity."""
+    vec = _embed(text)
+    if vec is None:
+        return None
+    try:
+        with _semantic_conn() as conn:
+            rows = conn.execute("SELECT embedding, result FROM entries WHERE pdf_sha = ?", (pdf_sha,)).fetchall()
+    except Exception:
+        return None
+    best_sim, best_result = 0.0, None
+    for blob, result_json in rows:
+        stored = np.frombuffer(blob, dtype=np.float32)
+        sim = float(np.dot(vec, stored))
+        if sim > best_sim:
+            best_sim, best_result = sim, result_json
+    if best_sim > SEMANTIC_THRESHOLD:
+        try:
+            return json.loads(best_result)
+        except Exception:
+            return None
+    return None
+
+def semantic_set(pdf_sha, text, result):
+    """Stores (pdf_sha, embedding of text, result) for future near-match lookups."""
+    vec = _embed(text)
+    if vec is None:
+        return
+    try:
+        with _semantic_conn() as conn:
+            conn.execute("INSERT INTO entries VALUES (?, ?, ?)",
+                         (pdf_sha, vec.tobytes(), json.dumps(result, ensure_ascii=False)))
+    except Exception as e:
+        print(f"Warning: Could not write semantic cache entry: {e}")
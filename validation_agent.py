@@ -2,13 +2,19 @@
 import os
 import time
 import json
+import asyncio
+import hashlib
+import concurrent.futures
 import pandas as pd
 import argparse
 import re
-from playwright.sync_api import sync_playwright
+from collections import defaultdict
+from playwright.async_api import async_playwright
 from tqdm import tqdm
 from colorama import init, Fore, Style
 
+import llm_cache
+
 # Initialize colorama
 init(autoreset=True)
 
@@ -16,185 +22,326 @@ init(autoreset=True)
 ARTICLES_DIR = 'Articles'
 INPUT_FILE = 'extracted_studies.xlsx'
 VALIDATION_LOG = 'validation_discrepancies.xlsx'
+VALIDATION_STATE = 'validation_discrepancies.parquet'
+RESULTS_LOG = 'validation_discrepancies.jsonl'
 GEMINI_URL = "https://gemini.google.com/app"
 
-def create_validation_prompt(row_data):
+# Bump when the validation prompt changes so stale cached responses are not reused
+PROMPT_VERSION = "v1"
+
+# Comma-unions of the historical per-element selector lists: Playwright
+# matches any of them with one locator, i.e. one round-trip to the browser
+# instead of a count()/is_visible() probe per selector.
+PLUS_SELECTOR = ", ".join([
+    "button[aria-label*='Upload']",
+    "button[aria-label*='Add files']",
+    "button[aria-label*='Upload files']",
+    "button[aria-label*='file menu']",
+    "mat-icon:has-text('add')",
+    "span:has-text('add')",
+    "button:has(mat-icon)",
+    "div[role='button']:has-text('add')"
+])
+UPLOAD_ITEM_SELECTOR = ", ".join([
+    "div[role='menuitem']:has-text('Upload')",
+    "span:has-text('Upload')",
+    "li:has-text('Upload')",
+    "[aria-label*='Upload']",
+    ".mat-mdc-menu-item:has-text('Upload')"
+])
+
+# Pulls "Smith" and "2024" out of a 'First Author (Year)' value like "Smith et al. 2024"
+_AUTHOR_YEAR_RE = re.compile(r'(\w+).*?(\d{4})')
+_YEAR_RE = re.compile(r'(?:19|20)\d{2}')
+
+def index_articles_by_year():
+    """Indexes the Articles listing once: year -> [(filename, lowercased)].
+
+    Smart matching then looks up only the handful of PDFs carrying the row's
+    year instead of rescanning the whole directory per row.
+    """
+    by_year = defaultdict(list)
+    if os.path.isdir(ARTICLES_DIR):
+        for f in os.listdir(ARTICLES_DIR):
+            fl = f.lower()
+            if fl.endswith('.pdf'):
+                for y in _YEAR_RE.findall(fl):
+                    by_year[y].append((f, fl))
+    return by_year
+
+# The prompt around the row data is fixed, so build it once at import time;
+# create_validation_prompt then does a single 3-part concatenation per row.
+_PROMPT_HEAD = (
+    "I have extracted the following data from the attached PDF study. Please verify the accuracy of each field against the PDF content.\n\n"
+    "### DATA TO VERIFY ###\n"
+)
+_PROMPT_TAIL = (
+    "\n\n### INSTRUCTIONS ###\n"
+    "1. Review the attached PDF carefully.\n"
+    "2. For each field in the provided JSON, check if the value is correct.\n"
+    "3. If a value is incorrect or incomplete, provide the correct information found in the PDF.\n"
+    "4. If you find any discrepancies, return your findings in the following JSON format:\n"
+    '{\n  "discrepancies": [\n    {\n      "field": "Field Name",\n      "extracted_value": "Value provided in prompt",\n      "correct_value": "Correct value from PDF",\n      "severity": "CRITICAL", // or "MINOR"\n      "description": "Explanation of the discrepancy"\n    }\n  ],\n  "status": "FAIL"\n}\n'
+    "\n### SEVERITY CRITERIA ###\n"
+    "- MINOR: Formatting issues (e.g. '50 %' vs '50%'), synonyms (e.g. 'Male' vs 'Men'), or rounding differences less than 1%.\n"
+    "- CRITICAL: Different numbers (>1% variance), swapped data, missing data that exists in text, or hallucinations.\n"
+    "5. CRITICAL: If all information is 100% correct AND no additions/corrections are needed, return:\n"
+    '{\n  "status": "PASS",\n  "discrepancies": []\n}\n'
+    "6. CRITICAL: If there is even a MINOR discrepancy, set status to 'FAIL' and list it with appropriate severity.\n"
+    "\nReturn ONLY the JSON object."
+)
+
+def preprocess_pdf(path):
+    """Strips embedded images from a PDF so the upload is a fraction of the size.
+
+    Validation only needs the text content, and images often dominate the
+    bytes of scientific PDFs. The stripped copy is cached by content sha under
+    .cache/stripped/. Returns the original path if pikepdf is not installed
+    or stripping fails.
+    """
+    try:
+        import pikepdf
+    except ImportError:
+        return path
+    try:
+        with open(path, 'rb') as f:
+            sha = hashlib.sha256(f.read()).hexdigest()
+        stripped_dir = os.path.join('.cache', 'stripped')
+        out_path = os.path.join(stripped_dir, f"{sha}.pdf")
+        if os.path.exists(out_path):
+            return out_path
+        os.makedirs(stripped_dir, exist_ok=True)
+        with pikepdf.open(path) as pdf:
+            for pdf_page in pdf.pages:
+                xobjects = pdf_page.get('/Resources', {}).get('/XObject')
+                if xobjects is not None:
+                    for key in [k for k, obj in xobjects.items()
+                                if obj.get('/Subtype') == pikepdf.Name('/Image')]:
+                        del xobjects[key]
+            pdf.remove_unreferenced_resources()
+            pdf.save(out_path)
+        return out_path
+    except Exception as e:
+        print(f"Warning: PDF stripping failed for {os.path.basename(path)} ({e}). Uploading original.")
+        return path
+
+def _extract_json_object(text):
+    """Returns the first balanced top-level {...} in text, or None if incomplete."""
+    start = text.find('{')
+    if start == -1:
+        return None
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+def create_validation_prompt(clean_data):
     """
     Creates a prompt for Gemini to validate the extracted data.
+
+    Takes the already-filtered {column: value} dict (meta columns and nulls
+    removed), which the caller builds once per row.
     """
-    # Remove 'Source File' and other meta columns from validation prompt
-    meta_cols = ['Source File', 'Unnamed: 0']
-    clean_data = {k: v for k, v in row_data.items() if k not in meta_cols and pd.notnull(v)}
-    
-    prompt = "I have extracted the following data from the attached PDF study. Please verify the accuracy of each field against the PDF content.\n\n"
-    prompt += "### DATA TO VERIFY ###\n"
-    prompt += json.dumps(clean_data, indent=2)
-    prompt += "\n\n### INSTRUCTIONS ###\n"
-    prompt += "1. Review the attached PDF carefully.\n"
-    prompt += "2. For each field in the provided JSON, check if the value is correct.\n"
-    prompt += "3. If a value is incorrect or incomplete, provide the correct information found in the PDF.\n"
-    prompt += "4. If you find any discrepancies, return your findings in the following JSON format:\n"
-    prompt += '{\n  "discrepancies": [\n    {\n      "field": "Field Name",\n      "extracted_value": "Value provided in prompt",\n      "correct_value": "Correct value from PDF",\n      "severity": "CRITICAL", // or "MINOR"\n      "description": "Explanation of the discrepancy"\n    }\n  ],\n  "status": "FAIL"\n}\n'
-    prompt += "\n### SEVERITY CRITERIA ###\n"
-    prompt += "- MINOR: Formatting issues (e.g. '50 %' vs '50%'), synonyms (e.g. 'Male' vs 'Men'), or rounding differences less than 1%.\n"
-    prompt += "- CRITICAL: Different numbers (>1% variance), swapped data, missing data that exists in text, or hallucinations.\n"
-    prompt += "5. CRITICAL: If all information is 100% correct AND no additions/corrections are needed, return:\n"
-    prompt += '{\n  "status": "PASS",\n  "discrepancies": []\n}\n'
-    prompt += "6. CRITICAL: If there is even a MINOR discrepancy, set status to 'FAIL' and list it with appropriate severity.\n"
-    prompt += "\nReturn ONLY the JSON object."
-    
-    return prompt
-
-def interact_with_gemini(page, pdf_path, prompt_text):
+    return _PROMPT_HEAD + json.dumps(clean_data, indent=2) + _PROMPT_TAIL
+
+async def interact_with_gemini(page, pdf_path, prompt_text):
     """
     Uploads PDF and sends the validation prompt to Gemini with dynamic waiting for speed.
     """
-    print(f"[{os.path.basename(pdf_path)}] Navigating to Gemini...")
-    try:
-        page.goto(GEMINI_URL, timeout=90000, wait_until="domcontentloaded")
-    except:
-        print("Page load taking longer than expected, proceeds anyway...")
+    name = os.path.basename(pdf_path)
+    if "gemini.google.com" not in page.url:
+        print(f"[{name}] Navigating to Gemini...")
+        try:
+            # "commit" returns as soon as navigation starts; the composer wait
+            # below gates readiness instead of the full load event
+            await page.goto(GEMINI_URL, timeout=90000, wait_until="commit")
+        except:
+            print("Page load taking longer than expected, proceeds anyway...")
+    else:
+        # Already on Gemini: "New chat" is a cheap client-side route change,
+        # not another full SPA boot
+        print(f"[{name}] Already on Gemini. Starting a new chat...")
+        try:
+            await page.locator("button:has-text('New chat'), a:has-text('New chat')").first.click(timeout=5000)
+        except:
+            pass
 
     # Upload Logic
-    print(f"[{os.path.basename(pdf_path)}] Attempting upload...")
+    print(f"[{name}] Attempting upload...")
     try:
-        # Give the UI a moment to settle
-        time.sleep(2)
-        
-        with page.expect_file_chooser(timeout=60000) as fc_info:
-            # Try multiple common labels for the 'Plus' button in Gemini
-            plus_selectors = [
-                "button[aria-label*='Upload']",
-                "button[aria-label*='Add files']",
-                "button[aria-label*='Upload files']",
-                "button[aria-label*='file menu']",
-                "mat-icon:has-text('add')",
-                "span:has-text('add')",
-                "button:has(mat-icon)",
-                "div[role='button']:has-text('add')"
-            ]
-            
+        # Wait for the composer itself instead of sleeping a fixed amount
+        await page.locator("div[contenteditable='true'], textarea").first.wait_for(state="visible", timeout=30000)
+
+        async with page.expect_file_chooser(timeout=60000) as fc_info:
             plus_found = False
-            
+
             # TRY CLICKING TEXT AREA FIRST TO REVEAL BUTTONS
             try:
-                page.locator("div[contenteditable='true'], textarea").first.click(timeout=5000)
-                time.sleep(1)
+                await page.locator("div[contenteditable='true'], textarea").first.click(timeout=5000)
+            except:
+                pass
+
+            # One union locator matches whichever 'Plus' variant this UI has
+            try:
+                btn = page.locator(PLUS_SELECTOR).first
+                await btn.wait_for(state="visible", timeout=10000)
+                await btn.click(force=True)
+                plus_found = True
             except:
                 pass
 
-            for selector in plus_selectors:
-                try:
-                    btn = page.locator(selector).first
-                    if btn.count() > 0 and btn.is_visible():
-                        print(f"[{os.path.basename(pdf_path)}] Found button with selector: {selector}")
-                        btn.click(force=True, timeout=10000)
-                        plus_found = True
-                        break
-                except:
-                    continue
-            
             if not plus_found:
-                print(f"[{os.path.basename(pdf_path)}] Plus button not found. Attempting generic click near input area...")
+                print(f"[{name}] Plus button not found. Attempting generic click near input area...")
                 try:
                     # Generic fallback: look for ANY button in the bottom input bar
                     btn = page.locator("div.input-area button, .input-area-container button").first
-                    if btn.count() > 0:
-                         btn.click(force=True, timeout=5000)
+                    if await btn.count() > 0:
+                         await btn.click(force=True, timeout=5000)
                          plus_found = True
                 except:
                     pass
 
             if not plus_found:
-                print(f"[{os.path.basename(pdf_path)}] Plus button still not found. Taking diagnostic 'no_plus.png'")
-                page.screenshot(path="no_plus.png")
+                print(f"[{name}] Plus button still not found. Taking diagnostic 'no_plus.png'")
+                await page.screenshot(path="no_plus.png")
                 return None
-            
-            time.sleep(2) # Wait for menu
-            
-            # Click the 'Upload' item with retries and more selectors
-            upload_selectors = [
-                "div[role='menuitem']:has-text('Upload')",
-                "span:has-text('Upload')",
-                "li:has-text('Upload')",
-                "[aria-label*='Upload']",
-                ".mat-mdc-menu-item:has-text('Upload')"
-            ]
-            
+
+            # Click the 'Upload' menu item; the union wait doubles as the
+            # menu-open wait
             upload_found = False
-            for target in upload_selectors:
-                try:
-                    upload_item = page.locator(target).first
-                    if upload_item.count() > 0 and upload_item.is_visible():
-                        upload_item.click(force=True, timeout=5000)
-                        upload_found = True
-                        break
-                except:
-                    continue
-            
+            try:
+                upload_item = page.locator(UPLOAD_ITEM_SELECTOR).first
+                await upload_item.wait_for(state="visible", timeout=5000)
+                await upload_item.click(force=True)
+                upload_found = True
+            except:
+                pass
+
             if not upload_found:
                  # Fallback: try finding any element with Upload text that is likely a menu item
                  try:
                     upload_item = page.get_by_text("Upload", exact=False).first
-                    upload_item.click(force=True, timeout=5000)
+                    await upload_item.click(force=True, timeout=5000)
                     upload_found = True
                  except:
                     pass
 
             if not upload_found:
-                print(f"[{os.path.basename(pdf_path)}] Upload menu item not found.")
+                print(f"[{name}] Upload menu item not found.")
                 return None
-        
-        file_chooser = fc_info.value
-        file_chooser.set_files(pdf_path)
-        
+
+        file_chooser = await fc_info.value
+        await file_chooser.set_files(pdf_path)
+
         # SMART WAIT FOR UPLOAD: Wait for the "chip" to appear or the upload indicator to finish
-        print(f"[{os.path.basename(pdf_path)}] Uploading... (Waiting for file to process)")
-        # We look for a file chip or wait up to 60s for slow internet
+        print(f"[{name}] Uploading... (Waiting for file to process)")
+        # We look for a file chip and wait up to 60s for slow internet
         try:
-            page.locator("file-chip, .file-name, [aria-label*='file']").first.wait_for(state="visible", timeout=60000)
-            time.sleep(2) # Tiny buffer for Gemini internal state
+            await page.locator("file-chip, .file-name, [aria-label*='file']").first.wait_for(state="visible", timeout=60000)
         except:
-            print("Slow upload/UI detection. Continuing after 15s fallback.")
-            time.sleep(15)
-        
+            print("Slow upload/UI detection. Continuing anyway...")
+
     except Exception as e:
-        print(f"[{os.path.basename(pdf_path)}] Upload failed: {e}")
+        print(f"[{name}] Upload failed: {e}")
         return None
 
-    # Prompting
+    return await send_prompt_and_await_response(page, pdf_path, prompt_text)
+
+async def interact_with_gemini_followup(page, pdf_path, prompt_text):
+    """
+    Sends a follow-up prompt in an existing conversation (PDF already uploaded).
+
+    Skips navigation and upload entirely — Gemini keeps the attached PDF in
+    context across turns, so duplicate-PDF rows only pay for the response.
+    """
+    print(f"[{os.path.basename(pdf_path)}] Reusing conversation (follow-up prompt)...")
+    return await send_prompt_and_await_response(page, pdf_path, prompt_text)
+
+async def send_prompt_and_await_response(page, pdf_path, prompt_text):
+    """Fills the composer, sends the prompt, and parses Gemini's JSON response."""
+    name = os.path.basename(pdf_path)
     try:
         text_area = page.locator("div[contenteditable='true'], textarea").first
-        text_area.fill(prompt_text)
-        time.sleep(1)
-        text_area.press("Enter")
-        print(f"[{os.path.basename(pdf_path)}] Prompt sent. Waiting for response...")
-        
-        # SMART WAIT FOR RESPONSE: Instead of 40s, monitor the "Stop" button or response text
-        # Gemini shows a 'stop' button (interrupt) while generating.
-        stop_btn = page.locator("button[aria-label*='Stop'], button[aria-label*='Interrupt']")
-        
-        # Initial wait for generation to start
-        time.sleep(5)
-        
-        # Polling for "generation completion"
-        for _ in range(120): # Up to 120 seconds for very long responses/slow internet
-            if stop_btn.count() == 0 or not stop_btn.is_visible():
-                # Double check to see if the text is there
-                response_elements = page.locator("model-response, .model-response-text")
-                if response_elements.count() > 0:
-                    time.sleep(2) # Final settle
-                    break
-            time.sleep(1)
-        
-        # Extract Response
-        response_elements = page.locator("model-response, .model-response-text") 
-        if response_elements.count() > 0:
-            last_response = response_elements.all()[-1].inner_text()
+        await text_area.fill(prompt_text)
+
+        # Snapshot how many responses the conversation already shows: in the
+        # follow-up path the previous turn's answer is still in the DOM, and
+        # the poll below must not mistake it for this prompt's response
+        response_elements = page.locator("model-response, .model-response-text")
+        prev_count = await response_elements.count()
+
+        await text_area.press("Enter")
+        print(f"[{name}] Prompt sent. Waiting for response...")
+
+        # SMART WAIT FOR RESPONSE: event-based waits on the "Stop" button.
+        # Gemini shows a 'stop' button (interrupt) while generating; visible
+        # means generation started, hidden means it finished.
+        stop_btn = page.locator("button[aria-label*='Stop'], button[aria-label*='Interrupt']").first
+        try:
+            await stop_btn.wait_for(state="visible", timeout=15000)
+        except:
+            pass # Very fast responses can finish before we see the button
+
+        # Stream the rendered text: poll every 500ms and stop as soon as a
+        # balanced JSON object parses — Gemini usually finishes rendering the
+        # JSON a few seconds before the Stop button toggles off. The button
+        # stays as the backstop for non-JSON responses. Only elements beyond
+        # prev_count are this turn's response; earlier ones are stale.
+        last_response = None
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            try:
+                if await response_elements.count() > prev_count:
+                    txt = await response_elements.last.inner_text()
+                    json_str = _extract_json_object(txt)
+                    if json_str is not None:
+                        try:
+                            json.loads(json_str)
+                            last_response = txt
+                            break
+                        except ValueError:
+                            pass
+                    if not await stop_btn.is_visible():
+                        break # Generation finished without a parsable object
+            except:
+                pass
+            await asyncio.sleep(0.5)
         else:
-            print("No response text found. Waiting 10 more seconds and grabbing page content.")
-            time.sleep(10)
-            last_response = page.content()
+            print(f"[{name}] Generation still running after 120s. Grabbing what is there.")
+
+        # Extract Response (when the streaming poll did not already get it)
+        if last_response is None and await response_elements.count() > prev_count:
+            last_response = await response_elements.last.inner_text()
+        if last_response is None:
+            if prev_count > 0:
+                # The main pane would only hand back the previous turn's text
+                return {"status": "ERROR", "message": "No new response located"}
+            # Scoped text grab: page.content() serializes the entire DOM
+            # (multiple MB of markup) just to be scanned for one JSON object
+            print("No response element found. Grabbing main-pane text.")
+            try:
+                last_response = await page.locator("main, [role='main']").first.inner_text()
+            except:
+                last_response = ""
+            if not last_response.strip():
+                return {"status": "ERROR", "message": "No response located"}
 
         # Parse JSON
         start = last_response.find('{')
@@ -203,50 +350,123 @@ def interact_with_gemini(page, pdf_path, prompt_text):
             json_str = last_response[start:end]
             try:
                 data = json.loads(json_str)
-                
+
                 # Check for severity and potentially downgrade FAIL to PASS
                 if data.get('status') == 'FAIL' and data.get('discrepancies'):
                     critical_errors = [d for d in data['discrepancies'] if d.get('severity') == 'CRITICAL']
                     if not critical_errors:
-                         print(f"[{os.path.basename(pdf_path)}] Downgrading FAIL to PASS (Only MINOR discrepancies found).")
+                         print(f"[{name}] Downgrading FAIL to PASS (Only MINOR discrepancies found).")
                          data['status'] = 'PASS'
-                
+
                 # Code-level Override: If Gemini hallucinates PASS but lists discrepancies, force FAIL
                 # (Only force FAIL if there are CRITICAL errors, otherwise let it PASS)
                 if data.get('status') == 'PASS' and data.get('discrepancies'):
                     critical_errors = [d for d in data['discrepancies'] if d.get('severity', 'CRITICAL') == 'CRITICAL']
                     if critical_errors:
-                        print(f"[{os.path.basename(pdf_path)}] Overriding PASS to FAIL due to CRITICAL discrepancies.")
+                        print(f"[{name}] Overriding PASS to FAIL due to CRITICAL discrepancies.")
                         data['status'] = 'FAIL'
 
                 return data
             except:
-                print(f"[{os.path.basename(pdf_path)}] JSON parsing failed.")
+                print(f"[{name}] JSON parsing failed.")
                 return {"status": "ERROR", "message": "JSON Parse Error", "raw_response": last_response}
         else:
             return {"status": "ERROR", "message": "No JSON found", "raw_response": last_response}
 
     except Exception as e:
-        print(f"[{os.path.basename(pdf_path)}] Interaction failed: {e}")
+        print(f"[{name}] Interaction failed: {e}")
         return None
 
-def main(limit=None, browser_channel="chrome", files_to_validate=None):
+def append_result_log(result):
+    """Appends one validation result to the crash-safe JSONL log (O(1) per row)."""
+    with open(RESULTS_LOG, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+        f.flush()
+
+def flatten_results(validation_results):
+    """Flattens result dicts into one row per discrepancy for the Excel log."""
+    flattened = []
+    for res in validation_results:
+        sf = res.get('Source File')
+        status = res.get('status')
+        if not res.get('discrepancies'):
+            desc = 'None' if status != 'NO DATA' else 'Row has no extracted data points to verify'
+            flattened.append({
+                'Source File': sf,
+                'Status': status,
+                'Field': None,
+                'Extracted Value': None,
+                'Correct Value': None,
+                'Description': desc
+            })
+        else:
+            for d in res['discrepancies']:
+                flattened.append({
+                    'Source File': sf,
+                    'Status': status,
+                    'Field': d.get('field'),
+                    'Extracted Value': d.get('extracted_value'),
+                    'Correct Value': d.get('correct_value'),
+                    'Description': d.get('description')
+                })
+    return flattened
+
+def finalize_log():
+    """Folds the JSONL log into the parquet state and renders the xlsx once."""
+    if not os.path.exists(RESULTS_LOG):
+        return
+    results = []
+    with open(RESULTS_LOG, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    results.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    if results:
+        res_df = pd.DataFrame(flatten_results(results))
+        try:
+            res_df.to_parquet(VALIDATION_STATE, engine='pyarrow', compression='zstd')
+        except Exception as e:
+            print(f"Warning: Parquet state write failed ({e}).")
+        try:
+            # xlsxwriter serializes large sheets several times faster than openpyxl
+            res_df.to_excel(VALIDATION_LOG, index=False, engine='xlsxwriter')
+        except ImportError:
+            res_df.to_excel(VALIDATION_LOG, index=False)
+        print(f"Validation log saved to {VALIDATION_LOG}")
+    os.remove(RESULTS_LOG)
+
+async def main(limit=None, browser_channel="chrome", files_to_validate=None, concurrency=3,
+               worker_id=0, num_workers=1):
     if not os.path.exists(INPUT_FILE):
         print(f"Error: {INPUT_FILE} not found.")
         return
 
-    df = pd.read_excel(INPUT_FILE)
+    # Recover any results a previous crashed run left in the JSONL sidecar
+    # before new lines are appended, mirroring the extractor's startup fold.
+    # Sharded workers skip this: the parent folds once before spawning them.
+    if num_workers == 1:
+        finalize_log()
+
+    # calamine parses xlsx an order of magnitude faster than openpyxl, and
+    # pyarrow-backed dtypes keep the frame far smaller than object columns
+    try:
+        df = pd.read_excel(INPUT_FILE, dtype_backend='pyarrow', engine='calamine')
+    except ImportError:
+        df = pd.read_excel(INPUT_FILE, dtype_backend='pyarrow')
     if 'Source File' not in df.columns:
         print("Error: 'Source File' column missing in Excel.")
         return
-    
+
     # Filter by specific files if provided (Priority over limit)
     if files_to_validate:
         print(f"Targeted Validation: Checking {len(files_to_validate)} specific files.")
         # Create a mask for matches (exact or partial string match if cleaner)
         # Using exact match for robustness as Source File should be the full filename
         df = df[df['Source File'].isin(files_to_validate)]
-    
+
     # Apply limit if provided AND no specific files (OR apply limit to the specific files?)
     elif limit:
         print(f"Applying limit of {limit} rows for validation.")
@@ -255,27 +475,30 @@ def main(limit=None, browser_channel="chrome", files_to_validate=None):
     # Ensure Source File is string to avoid type warnings during matching
     df['Source File'] = df['Source File'].astype(object)
 
+    # Round-robin shard when several worker processes split the rows
+    if num_workers > 1:
+        df = df.iloc[worker_id::num_workers]
+        print(f"Worker {worker_id}: validating {len(df)} of the sharded rows.")
+
     print(f"\n{Fore.CYAN}{'='*60}")
-    print(f"{Fore.CYAN}⚖️ STARTING DATA VALIDATION")
+    print(f"{Fore.CYAN}⚖️ STARTING DATA VALIDATION ({concurrency} concurrent tabs)")
     print(f"{Fore.CYAN}{'='*60}\n")
 
     validation_results = []
-    
-    # Store the full original dataframe to avoid truncation when saving
-    full_df = pd.read_excel(INPUT_FILE)
-    # We no longer add 'Result' or 'Validation Feedback' columns to the main file
-    # to keep it clean, but we still perform validation for the logs/healing.
 
-    with sync_playwright() as p:
+    async with async_playwright() as p:
         profile_name = f"{browser_channel}_profile"
+        if num_workers > 1:
+            # Each worker process needs its own profile (and Gemini login)
+            profile_name = f"{profile_name}_{worker_id}"
         user_data_dir = os.path.join("C:\\Users\\HP", f"gemini_{profile_name}")
-        
+
         try:
             print(f"Launching {browser_channel}...")
-            browser = p.chromium.launch_persistent_context(
-                user_data_dir, 
-                headless=False, 
-                channel=browser_channel, 
+            browser = await p.chromium.launch_persistent_context(
+                user_data_dir,
+                headless=False,
+                channel=browser_channel,
                 args=[
                     "--disable-blink-features=AutomationControlled",
                     "--start-maximized",
@@ -288,34 +511,41 @@ def main(limit=None, browser_channel="chrome", files_to_validate=None):
                 ],
                 ignore_default_args=["--enable-automation"],
                 user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                slow_mo=50
+                slow_mo=0
             )
-            
+
             # Setup first page
-            page = browser.pages[0] if browser.pages else browser.new_page()
-            page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            
+            page = browser.pages[0] if browser.pages else await browser.new_page()
+            await page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+
             print(f"Navigating to {GEMINI_URL}...")
             for attempt in range(3):
                 try:
-                    page.goto(GEMINI_URL, timeout=60000, wait_until="load")
+                    await page.goto(GEMINI_URL, timeout=60000, wait_until="commit")
                     break
                 except Exception as e:
                     if attempt == 2: raise
                     print(f"Retry {attempt+1} due to: {e}")
-                    time.sleep(2)
-            
+                    await asyncio.sleep(2)
+
+            # Don't wait for the full load event (analytics/fonts); the login
+            # poll below keys off specific locators anyway
+            try:
+                await page.locator("div[contenteditable='true'], textarea").first.wait_for(state="visible", timeout=30000)
+            except:
+                pass
+
             print("\n" + "="*50)
             print("AUTOMATED LOGIN WAIT")
             print("Please log into Gemini in the opened browser window.")
             print("The agent will automatically detect when you are logged in...")
             print("="*50 + "\n")
-            
+
             # Automated polling for login
             login_detected = False
             diagnostic_taken = False
             print("Monitoring browser for login... (Will auto-start when prompt area appears)")
-            
+
             for i in range(120): # Wait up to 10 minutes
                 try:
                     # Check for several indicators of being logged in:
@@ -325,162 +555,238 @@ def main(limit=None, browser_channel="chrome", files_to_validate=None):
                     prompt_area = page.locator("div[contenteditable='true'], textarea").first
                     new_chat = page.locator("button:has-text('New chat'), a:has-text('New chat')").first
                     user_profile = page.locator("button[aria-label*='Google Account']").first
-                    
-                    if prompt_area.is_visible() or new_chat.is_visible() or user_profile.is_visible():
+
+                    if await prompt_area.is_visible() or await new_chat.is_visible() or await user_profile.is_visible():
                         print("\n[SUCCESS] Login detected! Initialization starting in 3 seconds...")
-                        time.sleep(3)
+                        await asyncio.sleep(3)
                         login_detected = True
                         break
                 except Exception as e:
                     pass
-                
+
                 if i > 0 and i % 12 == 0: # Every 60 seconds
                      print(f"Still waiting... ({i*5}s elapsed). Please ensure you are logged in and looking at the Gemini home screen.")
                      if not diagnostic_taken:
-                         page.screenshot(path="login_debug.png")
+                         await page.screenshot(path="login_debug.png")
                          print("Took 'login_debug.png' for diagnostic purposes.")
                          diagnostic_taken = True
-                
-                time.sleep(5)
-            
+
+                await asyncio.sleep(5)
+
             if not login_detected:
                 print("Detection timed out. Taking final screenshot and exiting.")
-                page.screenshot(path="login_timeout.png")
+                await page.screenshot(path="login_timeout.png")
                 return
 
         except Exception as e:
             print(f"Failed to launch browser: {e}")
             return
 
-        pbar = tqdm(df.iterrows(), total=len(df), desc=f"{Fore.YELLOW}Total Progress", unit="row")
-        for index, row in pbar:
+        # Gemini waits are IO-bound, so N concurrent tabs give a near-linear
+        # speedup. The tabs live in a pool and are reused across groups —
+        # "New chat" resets conversation state while the SPA, JS engine and
+        # websocket stay warm instead of re-booting per row. Waiting on the
+        # pool also caps how many validations are in flight at once.
+        page_pool = asyncio.Queue()
+        await page_pool.put(page)  # reuse the login tab as the first slot
+        for _ in range(max(1, int(concurrency)) - 1):
+            extra = await browser.new_page()
+            await extra.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+            await page_pool.put(extra)
+
+        articles_by_year = index_articles_by_year()
+        pbar = tqdm(total=len(df), desc=f"{Fore.YELLOW}Total Progress", unit="row")
+
+        # Vectorized empty-row check: one C-level scan over the data columns
+        # instead of building a filtered dict for every row
+        meta_cols = ['Source File', 'Sl.no', 'Unnamed: 0']
+        data_cols = [c for c in df.columns if c not in meta_cols]
+        has_data = df[data_cols].notnull().any(axis=1)
+
+        # Pre-pass: resolve each row's PDF, serve cache hits, and group the
+        # remaining work by PDF. Rows sharing a PDF become one conversation —
+        # the first row uploads, later rows are sent as follow-up prompts.
+        pending = {}  # pdf_path -> list of job dicts, in row order
+
+        def prepare_row(index, row):
             source_file = row['Source File']
             author_year = str(row.get('First Author (Year)', ''))
-            
+
             pbar.set_postfix_str(f"{Fore.CYAN}Checking Row {index+1}")
-            
+
             # --- SMART MATCHING LOGIC ---
             if (not isinstance(source_file, str) or pd.isna(source_file)) and author_year:
-                import re
                 pbar.set_postfix_str(f"{Fore.BLUE}Matching PDF...")
-                
-                match = re.search(r'(\w+).*?(\d{4})', author_year)
+
+                match = _AUTHOR_YEAR_RE.search(author_year)
                 if match:
                     author_name = match.group(1).lower()
                     year = match.group(2)
-                    
-                    for f in os.listdir(ARTICLES_DIR):
-                        f_lower = f.lower()
-                        if author_name in f_lower and year in f_lower and f_lower.endswith('.pdf'):
+
+                    for f, f_lower in articles_by_year.get(year, ()):
+                        if author_name in f_lower:
                             source_file = f
                             tqdm.write(f"{Fore.GREEN}✔ Smart Matched '{author_year}' to: {source_file}")
                             df.at[index, 'Source File'] = source_file
                             break
-            
+
             # Handle NaN or non-string values (if still NaN after matching)
             if not isinstance(source_file, str) or pd.isna(source_file):
-                if index < 50: 
+                if index < 50:
                     print(f"Skipping row {index+1}: 'Source File' is empty or invalid.")
-                continue
+                pbar.update(1)
+                return
 
             pdf_path = os.path.join(ARTICLES_DIR, source_file)
-            
+
             if not os.path.exists(pdf_path):
                 # Try finding it in Articles/ (just in case path is slightly different)
                 if os.path.exists(os.path.join(ARTICLES_DIR, os.path.basename(source_file))):
                     pdf_path = os.path.join(ARTICLES_DIR, os.path.basename(source_file))
                 else:
                     print(f"Warning: PDF not found at {pdf_path}. Skipping.")
-                    continue
+                    pbar.update(1)
+                    return
 
             # Check for data in the row (excluding metadata)
-            meta_cols = ['Source File', 'Sl.no', 'Unnamed: 0']
-            clean_data = {k: v for k, v in row.to_dict().items() if k not in meta_cols and pd.notnull(v)}
-            
-            if not clean_data:
+            if not has_data.at[index]:
                 print(f"INFO: No data found for {source_file} (Row {index+1}). Logging as NO DATA.")
-                validation_results.append({
+                result = {
                     'Source File': source_file,
                     'status': 'NO DATA',
                     'discrepancies': []
-                })
-                continue
+                }
+                validation_results.append(result)
+                append_result_log(result)
+                pbar.update(1)
+                return
 
             print(f"\n--- Validating {source_file} (Row {index+1}) ---")
-            
-            prompt_text = create_validation_prompt(row.to_dict())
-            
-            # Use a new tab for each validation to avoid context leakage
-            new_page = browser.new_page()
-            new_page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            try:
-                result = interact_with_gemini(new_page, pdf_path, prompt_text)
-                if result:
-                    result['Source File'] = source_file
-                    status = result.get('status', 'FAIL')
-                    validation_results.append(result)
-                    
-                    # Logic for console output and logging (DataFrame is NOT modified)
-                    if status == 'PASS':
-                        tqdm.write(f"{Fore.GREEN}✔ {author_year[:30]} - PASS")
-                    else:
-                        # Aggregate discrepancy descriptions
-                        for disc in result.get('discrepancies', []):
-                            field = disc.get('field', 'Unknown')
-                            sev = disc.get('severity', 'UNKNOWN')
-                            desc = disc.get('description', 'No description')
-                            color = Fore.RED if sev == 'CRITICAL' else Fore.YELLOW
-                            tqdm.write(f"  {color}→ [{sev}] {field}: {desc[:50]}...")
-                        
-                        tqdm.write(f"{Fore.RED}✘ Discrepancy Found: {author_year[:30]}")
 
+            # Only rows that actually go to Gemini pay for the dict build
+            clean_data = {k: v for k, v in row.to_dict().items() if k not in meta_cols and pd.notnull(v)}
+            prompt_text = create_validation_prompt(clean_data)
+
+            # Cache hit: identical PDF bytes + identical prompt were already validated
+            cache_key = llm_cache.make_key(pdf_path, prompt_text, PROMPT_VERSION)
+            pdf_sha = cache_key.split(':', 1)[0]
+            data_text = json.dumps(clean_data, indent=2)
+            cached = llm_cache.get(cache_key)
+            if cached is None and not files_to_validate:
+                # Near-match: same PDF, data differing only in formatting or
+                # whitespace. Skipped for targeted runs (--files): the healing
+                # re-validation must ask Gemini about the corrected data, not
+                # have the old FAIL verdict replayed from a near-miss embedding.
+                cached = llm_cache.semantic_get(pdf_sha, data_text)
+            if cached is not None:
+                tqdm.write(f"{Fore.GREEN}✔ {source_file} - cached result reused")
+                cached['Source File'] = source_file
+                validation_results.append(cached)
+                append_result_log(cached)
+                pbar.update(1)
+                return
+
+            pending.setdefault(pdf_path, []).append({
+                'source_file': source_file,
+                'author_year': author_year,
+                'pdf_path': pdf_path,
+                # Upload the image-stripped copy; cache keys stay on the original
+                'upload_path': preprocess_pdf(pdf_path),
+                'prompt_text': prompt_text,
+                'cache_key': cache_key,
+                'pdf_sha': pdf_sha,
+                'data_text': data_text,
+            })
+
+        def handle_result(job, result):
+            author_year = job['author_year']
+            if result:
+                result['Source File'] = job['source_file']
+                status = result.get('status', 'FAIL')
+                validation_results.append(result)
+                append_result_log(result)
+                if status != 'ERROR':
+                    llm_cache.set(job['cache_key'], result)
+                    llm_cache.semantic_set(job['pdf_sha'], job['data_text'], result)
+
+                # Logic for console output and logging (DataFrame is NOT modified)
+                if status == 'PASS':
+                    tqdm.write(f"{Fore.GREEN}✔ {author_year[:30]} - PASS")
                 else:
-                    tqdm.write(f"{Fore.RED}✘ Interaction failed for {author_year}")
-            finally:
-                new_page.close()
-
-            # Save the full dataframe back to ensure no data loss
-            full_df.to_excel(INPUT_FILE, index=False)
-
-            # Save incrementally
-            if validation_results:
-                # Flatten discrepancies for Excel output
-                flattened = []
-                for res in validation_results:
-                    sf = res.get('Source File')
-                    status = res.get('status')
-                    if not res.get('discrepancies'):
-                        desc = 'None' if status != 'NO DATA' else 'Row has no extracted data points to verify'
-                        flattened.append({
-                            'Source File': sf,
-                            'Status': status,
-                            'Field': None,
-                            'Extracted Value': None,
-                            'Correct Value': None,
-                            'Description': desc
-                        })
+                    # Aggregate discrepancy descriptions
+                    for disc in result.get('discrepancies', []):
+                        field = disc.get('field', 'Unknown')
+                        sev = disc.get('severity', 'UNKNOWN')
+                        desc = disc.get('description', 'No description')
+                        color = Fore.RED if sev == 'CRITICAL' else Fore.YELLOW
+                        tqdm.write(f"  {color}→ [{sev}] {field}: {desc[:50]}...")
+
+                    tqdm.write(f"{Fore.RED}✘ Discrepancy Found: {author_year[:30]}")
+
+            else:
+                tqdm.write(f"{Fore.RED}✘ Interaction failed for {author_year}")
+
+        async def run_group(jobs):
+            # Borrow a warm tab; rows for the same PDF share the conversation
+            tab = await page_pool.get()
+            try:
+                uploaded = False
+                for job in jobs:
+                    if uploaded:
+                        result = await interact_with_gemini_followup(tab, job['pdf_path'], job['prompt_text'])
                     else:
-                        for d in res['discrepancies']:
-                            flattened.append({
-                                'Source File': sf,
-                                'Status': status,
-                                'Field': d.get('field'),
-                                'Extracted Value': d.get('extracted_value'),
-                                'Correct Value': d.get('correct_value'),
-                                'Description': d.get('description')
-                            })
-                
-                res_df = pd.DataFrame(flattened)
-                res_df.to_excel(VALIDATION_LOG, index=False)
-                print(f"Incremental log saved to {VALIDATION_LOG}")
+                        result = await interact_with_gemini(tab, job['upload_path'], job['prompt_text'])
+                        # Only reuse the conversation if the upload actually went through
+                        uploaded = result is not None
+                    handle_result(job, result)
+                    pbar.update(1)
+            finally:
+                if tab.is_closed():
+                    # Replace a crashed tab so the pool keeps its size
+                    tab = await browser.new_page()
+                    await tab.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+                await page_pool.put(tab)
+
+        try:
+            for index, row in df.iterrows():
+                prepare_row(index, row)
+            await asyncio.gather(*(run_group(jobs) for jobs in pending.values()))
+        finally:
+            # The JSONL lines survive a crash; materialize parquet + xlsx once.
+            # Sharded workers leave folding to the parent so one worker's fold
+            # does not drop lines another worker is still appending.
+            if num_workers == 1:
+                finalize_log()
+            pbar.close()
 
         print("\nValidation complete. Browser remains open.")
-        time.sleep(5)
+        await asyncio.sleep(5)
+
+def run_worker(worker_id, num_workers, limit, browser_channel, files_to_validate, concurrency):
+    """Entry point for one sharded validation process."""
+    asyncio.run(main(limit=limit, browser_channel=browser_channel,
+                     files_to_validate=files_to_validate, concurrency=concurrency,
+                     worker_id=worker_id, num_workers=num_workers))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--limit", help="Limit number of rows to validate", default=None)
     parser.add_argument("--browser", help="Browser channel (chrome, msedge)", default="chrome")
     parser.add_argument("--files", help="Specific files to validate", nargs="+", default=None)
+    parser.add_argument("--concurrency", help="Number of rows validated concurrently", type=int, default=3)
+    parser.add_argument("--workers", help="Number of browser processes (each needs its own logged-in profile)", type=int, default=1)
     args = parser.parse_args()
-    main(limit=args.limit, browser_channel=args.browser, files_to_validate=args.files)
+
+    if args.workers > 1:
+        print(f"Sharding validation across {args.workers} worker processes...")
+        # Fold any crashed run's leftover lines before the workers start appending
+        finalize_log()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(run_worker, i, args.workers, args.limit, args.browser, args.files, args.concurrency)
+                       for i in range(args.workers)]
+            for future in futures:
+                future.result()
+        # Fold every worker's JSONL lines into the state in one place
+        finalize_log()
+    else:
+        asyncio.run(main(limit=args.limit, browser_channel=args.browser, files_to_validate=args.files, concurrency=args.concurrency))